@@ -1,3 +1,7 @@
+import glob
+import hashlib
+import os
+import tempfile
 from contextlib import ExitStack
 from dataclasses import dataclass
 from typing import List
@@ -5,11 +9,14 @@ from typing import List
 import click
 import gradio as gr
 import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+from pyarrow import fs
 
 from parse_results import build_results
 
 
-@dataclass
+@dataclass(slots=True)
 class PlotConfig:
     x_title: str
     y_title: str
@@ -43,6 +50,8 @@ def run(from_results_dir, datasource, port):
     '''
 
     df_bench = pd.DataFrame()
+    df_summary = pd.DataFrame()
+    percentile_columns = {}
     line_plots_bench = []
     column_mappings = {'inter_token_latency_ms_p90': 'ITL P90 (ms)', 'time_to_first_token_ms_p90': 'TTFT P90 (ms)',
                        'e2e_latency_ms_p90': 'E2E P90 (ms)', 'token_throughput_secs': 'Throughput (tokens/s)',
@@ -57,50 +66,70 @@ def run(from_results_dir, datasource, port):
         return update_bench(model_bench, percentiles)
 
     def update_bench(model, percentiles):
-        res = []
-        for plot in line_plots_bench:
-            if plot['config'].percentiles:
-                k = plot['metric'] + '_' + str(percentiles)
-                df_bench[plot['metric']] = df_bench[k] if k in df_bench.columns else 0
-            res.append(df_bench[(df_bench['model'] == model)])
+        # filter once, every plot shows the same model slice
+        data = with_percentile(df_bench.loc[model], percentiles)
+        return [data] * len(line_plots_bench)
 
-        return res + [summary_table()]
+    def with_percentile(data, percentile) -> pd.DataFrame:
+        # expose the selected percentile column under the metric name the plots use,
+        # on the (small) slice rather than by copying columns into df_bench
+        return data.assign(**{
+            k: data[percentile_columns[(k, percentile)]] if (k, percentile) in percentile_columns else 0
+            for k, v in metrics.items() if v.percentiles})
 
     def summary_table() -> pd.DataFrame:
-        data = df_bench.groupby(['model', 'run_id', 'rate']).agg(
-            {'inter_token_latency_ms_p90': 'mean', 'time_to_first_token_ms_p90': 'mean',
-             'e2e_latency_ms_p90': 'mean', 'token_throughput_secs': 'mean',
-             'successful_requests': 'mean', 'error_rate': 'mean'}).reset_index()
-        data = data[
-            ['run_id', 'model', 'rate', 'inter_token_latency_ms_p90', 'time_to_first_token_ms_p90',
-             'e2e_latency_ms_p90',
-             'token_throughput_secs']]
-        for metric in ['inter_token_latency_ms_p90', 'time_to_first_token_ms_p90', 'e2e_latency_ms_p90',
-                       'token_throughput_secs']:
-            data[metric] = pd.to_numeric(data[metric], errors='coerce').round(2)
+        summary_metrics = ['inter_token_latency_ms_p90', 'time_to_first_token_ms_p90', 'e2e_latency_ms_p90',
+                           'token_throughput_secs']
+        # project the displayed metrics before grouping so only those columns are aggregated
+        data = df_bench[['model', 'run_id', 'rate'] + summary_metrics].groupby(
+            ['model', 'run_id', 'rate'], observed=True).mean().reset_index()
+        data = data[['run_id', 'model', 'rate'] + summary_metrics]
+        # aggregated means are already numeric, widen back from float32 so the rounded values display exactly
+        # and round the whole block in one pass
+        data = data.astype({metric: 'float64' for metric in summary_metrics}).round(
+            {metric: 2 for metric in summary_metrics})
         data = data.rename(
             columns=column_mappings)
         return data
 
     def load_bench_results(source) -> pd.DataFrame:
-        data = pd.read_parquet(source)
-        # remove warmup and throughput
-        data = data[(data['id'] != 'warmup') & (data['id'] != 'throughput')]
-        # only keep constant rate
-        data = data[data['executor_type'] == 'ConstantArrivalRate']
+        # only read the columns the dashboard displays
+        columns = {'model', 'run_id', 'rate', *column_mappings}
+        for k, v in metrics.items():
+            columns.add(k)
+            if v.percentiles:
+                columns.update(f'{k}_{p}' for p in percentiles)
+        dataset = ds.dataset(source, format='parquet')
+        # remove warmup and throughput, only keep constant rate; filtered while scanning
+        table = dataset.to_table(columns=[c for c in dataset.schema.names if c in columns],
+                                 filter=~ds.field('id').isin(['warmup', 'throughput']) & (
+                                         ds.field('executor_type') == 'ConstantArrivalRate'))
+        # metrics don't need double precision, halve the bytes every mask and reduction touches;
+        # rate stays float64 as it is the x axis and the region selection bound
+        table = table.cast(pa.schema([
+            f.with_type(pa.float32()) if pa.types.is_float64(f.type) and f.name != 'rate' else
+            f.with_type(pa.int32()) if f.name == 'successful_requests' else f
+            for f in table.schema], metadata=table.schema.metadata))
+        data = table.to_pandas(types_mapper=pd.ArrowDtype)
+        # compare string columns on integer codes rather than Python objects
+        # (Arrow-backed strings can't become categories when entirely null, e.g. device=None from --from-results-dir,
+        # so only cast the always-populated labels the dashboard filters on)
+        data = data.astype({'model': 'category', 'run_id': 'category'})
+        # sorted (model, rate) index so callbacks slice instead of scanning the whole frame,
+        # keep the columns for plotting and give the levels distinct names to avoid groupby ambiguity
+        data = data.set_index(['model', 'rate'], drop=False).rename_axis(['model_idx', 'rate_idx']).sort_index()
         return data
 
-    def select_region(selection: gr.SelectData, model):
+    def select_region(selection: gr.SelectData, model, percentiles):
         min_w, max_w = selection.index
-        data = df_bench[(df_bench['model'] == model) & (df_bench['rate'] >= min_w) & (
-                df_bench['rate'] <= max_w)]
+        data = with_percentile(df_bench.loc[pd.IndexSlice[model, min_w:max_w], :], percentiles)
+        # find the y values for the selected region, all metrics in one reduction;
+        # cast to plain floats first so an empty selection gives NaN (null in JSON) rather than Arrow's pd.NA
+        stats = data[[plot["metric"] for plot in line_plots_bench]].astype('float64').agg(['min', 'max'])
         res = []
         for plot in line_plots_bench:
-            # find the y values for the selected region
             metric = plot["metric"]
-            y_min = data[metric].min()
-            y_max = data[metric].max()
-            res.append(gr.LinePlot(x_lim=[min_w, max_w], y_lim=[y_min, y_max]))
+            res.append(gr.LinePlot(x_lim=[min_w, max_w], y_lim=[stats.loc['min', metric], stats.loc['max', metric]]))
         return res
 
     def reset_region():
@@ -109,19 +138,41 @@ def run(from_results_dir, datasource, port):
             res.append(gr.LinePlot(x_lim=None, y_lim=None))
         return res
 
+    def cache_s3_datasource(datasource) -> str:
+        s3, path = fs.FileSystem.from_uri(datasource)
+        info = s3.get_file_info(path)
+        # key the local copy on the object version so restarts skip the download unless it changed
+        prefix = os.path.join(tempfile.gettempdir(),
+                              f'inference-benchmarker-{hashlib.sha1(datasource.encode()).hexdigest()}-')
+        cache_path = f'{prefix}{hashlib.sha1(f"{info.size}:{info.mtime_ns}".encode()).hexdigest()}.parquet'
+        if not os.path.exists(cache_path):
+            # download to a unique file so concurrent dashboards don't write over each other
+            fd, part_path = tempfile.mkstemp(dir=tempfile.gettempdir(), prefix=os.path.basename(prefix),
+                                             suffix='.part')
+            os.close(fd)
+            try:
+                fs.copy_files(path, part_path, source_filesystem=s3, destination_filesystem=fs.LocalFileSystem())
+                os.replace(part_path, cache_path)
+            except BaseException:
+                os.remove(part_path)
+                raise
+        # drop copies of earlier versions of the same object
+        for stale in glob.glob(f'{glob.escape(prefix)}*.parquet'):
+            if stale != cache_path:
+                try:
+                    os.remove(stale)
+                except FileNotFoundError:
+                    pass
+        return cache_path
+
     def load_datasource(datasource, fn):
         if datasource.startswith('file://'):
-            return fn(datasource)
+            return fn(datasource[len('file://'):])
         elif datasource.startswith('s3://'):
-            return fn(datasource)
+            return fn(cache_s3_datasource(datasource))
         else:
             raise ValueError(f"Unknown datasource: {datasource}")
 
-    if from_results_dir is not None:
-        build_results(from_results_dir, 'benchmarks.parquet', None)
-    # Load data
-    df_bench = load_datasource(datasource, load_bench_results)
-
     # Define metrics
     metrics = {
         "inter_token_latency_ms": PlotConfig(title="Inter Token Latency (lower is better)", x_title="QPS",
@@ -139,9 +190,6 @@ def run(from_results_dir, datasource, port):
         "decoded_tokens": PlotConfig(title="Decoded tokens", x_title="QPS", y_title="Count")
     }
 
-    models = df_bench["model"].unique()
-    run_ids = df_bench["run_id"].unique()
-
     # get all available percentiles
     percentiles = set()
     for k, v in metrics.items():
@@ -150,14 +198,28 @@ def run(from_results_dir, datasource, port):
     percentiles = map(lambda p: f'p{int(float(p) * 100)}', percentiles)
     percentiles = sorted(list(percentiles))
     percentiles.append('avg')
+
+    if from_results_dir is not None:
+        build_results(from_results_dir, 'benchmarks.parquet', None)
+    # Load data
+    df_bench = load_datasource(datasource, load_bench_results)
+    # the summary only depends on the loaded data, compute it once instead of on every callback
+    df_summary = summary_table()
+    # column backing each (metric, percentile) choice, resolved once
+    percentile_columns = {(k, p): f'{k}_{p}' for k, v in metrics.items() if v.percentiles for p in percentiles
+                          if f'{k}_{p}' in df_bench.columns}
+
+    models = df_bench["model"].unique()
+
     with gr.Blocks(css=css, title="Inference Benchmarker") as demo:
         with gr.Row():
             gr.Markdown("# Inference-benchmarker 🤗\n## Benchmarks results")
         with gr.Row():
             gr.Markdown(summary_desc)
         with gr.Row():
+            # the summary does not depend on the selected model or percentile, render it once
             table = gr.DataFrame(
-                pd.DataFrame(),
+                df_summary,
                 elem_classes=["summary"],
             )
         with gr.Row():
@@ -186,13 +248,13 @@ def run(from_results_dir, datasource, port):
 
         for component in [model, percentiles_bench]:
             component.change(update_bench, [model, percentiles_bench],
-                             [item["component"] for item in line_plots_bench] + [table])
-        gr.on([plot["component"].select for plot in line_plots_bench], select_region, [model],
+                             [item["component"] for item in line_plots_bench])
+        gr.on([plot["component"].select for plot in line_plots_bench], select_region, [model, percentiles_bench],
               outputs=[item["component"] for item in line_plots_bench])
         gr.on([plot["component"].double_click for plot in line_plots_bench], reset_region, None,
               outputs=[item["component"] for item in line_plots_bench])
         demo.load(load_demo, [model, percentiles_bench],
-                  [item["component"] for item in line_plots_bench] + [table])
+                  [item["component"] for item in line_plots_bench])
 
     demo.launch(server_port=port, server_name="0.0.0.0")
 